@@ -5,27 +5,31 @@ from kfp import Client
 from typing import Union
 
 
-def get_client(
+def get_session(
     kf_endpoint: str,
-    namespace: str,
     username: Union[str, None] = None,
     password: Union[str, None] = None,
-):
-    """Get an authorized kfp client
+    pool_maxsize: int = 10,
+) -> requests.Session:
+    """Get a requests session logged in through Dex
 
     Args:
         kf_endpoint (str): The KFP endpoint (e.g. http://localhost:8080)
-        namespace (str): The user's namespace (e.g. kubeflow-user-example-com)
         username (Union[str, None], optional): The user id or email (e.g. user@example.com). Defaults to None.
         password (Union[str, None], optional): The user password (e.g. 12341234). Defaults to None.
+        pool_maxsize (int, optional): The number of pooled connections to keep to the endpoint. Defaults to 10.
 
     Returns:
-        kfp.Client: The KFP Client with an authorized session key
+        requests.Session: The session holding the authservice_session cookie
     """
     # get session
     sess = requests.Session()
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_maxsize
+    )
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+
     # login
     res = sess.get(kf_endpoint)
     req = re.search(pattern=".*req=([A-z0-9_-]+)", string=res.history[-1].text).groups(
@@ -37,7 +41,31 @@ def get_client(
     data = {"login": uname, "password": pword}
     url3 = f"{kf_endpoint}/dex/auth/local?req={req}"
     sess.post(url3, headers=headers, data=data)
-    
+
+    return sess
+
+
+def get_client(
+    kf_endpoint: str,
+    namespace: str,
+    username: Union[str, None] = None,
+    password: Union[str, None] = None,
+    session: Union[requests.Session, None] = None,
+):
+    """Get an authorized kfp client
+
+    Args:
+        kf_endpoint (str): The KFP endpoint (e.g. http://localhost:8080)
+        namespace (str): The user's namespace (e.g. kubeflow-user-example-com)
+        username (Union[str, None], optional): The user id or email (e.g. user@example.com). Defaults to None.
+        password (Union[str, None], optional): The user password (e.g. 12341234). Defaults to None.
+        session (Union[requests.Session, None], optional): An already logged in session (see get_session). Defaults to None.
+
+    Returns:
+        kfp.Client: The KFP Client with an authorized session key
+    """
+    sess = session if session else get_session(kf_endpoint, username, password)
+
     # attach session cookie to new client
     cookie = sess.cookies.get_dict()["authservice_session"]
 
@@ -0,0 +1,287 @@
+"""
+Client-side monitor for Katib experiments. Reads trials from the Katib UI
+backend (https://github.com/kubeflow/katib/tree/master/pkg/new-ui/v1beta1)
+through the Dex-authenticated session from kf_utils.client.get_session, and
+stops experiments through the Kubernetes API using the local kube config.
+"""
+import csv
+import io
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, Union
+
+import requests
+from kubernetes import client as k8s_client, config as k8s_config
+from kubernetes.client.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_TRIAL_STATES = {
+    "Succeeded",
+    "Failed",
+    "Killed",
+    "EarlyStopped",
+    "MetricsUnavailable",
+}
+TERMINAL_EXPERIMENT_STATES = {"Succeeded", "Failed"}
+
+Trial = namedtuple("Trial", ["name", "status", "metric", "duration", "params"])
+
+
+class ExperimentMonitor:
+    """Stream finished Katib trials and stop the experiment early
+
+    Args:
+        session (requests.Session): A logged in session (see kf_utils.client.get_session)
+        kf_endpoint (str): The Kubeflow endpoint (e.g. http://localhost:8080)
+        experiment_name (str): The Katib experiment name
+        namespace (str): The user's namespace (e.g. kubeflow-user-example-com)
+        objective_metric_name (str, optional): The metric to track. Defaults to "auc".
+        objective_type (str, optional): "maximize" or "minimize". Defaults to "maximize".
+        poll_interval (int, optional): Seconds between polls. Defaults to 15.
+        max_workers (int, optional): Concurrent trial lookups per poll. Defaults to 4.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        kf_endpoint: str,
+        experiment_name: str,
+        namespace: str,
+        objective_metric_name: str = "auc",
+        objective_type: str = "maximize",
+        poll_interval: int = 15,
+        max_workers: int = 4,
+    ):
+        self.session = session
+        self.base_url = kf_endpoint.rstrip("/") + "/katib"
+        self.experiment_name = experiment_name
+        self.namespace = namespace
+        self.objective_metric_name = objective_metric_name
+        self.objective_type = objective_type
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.best = None
+
+    def _get(self, path: str, **params) -> Union[dict, str]:
+        res = self.session.get(
+            f"{self.base_url}/{path}/", params={"namespace": self.namespace, **params}
+        )
+        res.raise_for_status()
+        return res.json()
+
+    def experiment_status(self) -> Union[str, None]:
+        """Get the type of the latest true condition of the experiment"""
+        experiment = self._get("fetch_experiment", experimentName=self.experiment_name)
+        conditions = experiment.get("status", {}).get("conditions", [])
+        active = [c["type"] for c in conditions if c.get("status") == "True"]
+        return active[-1] if active else None
+
+    def fetch_trials(self) -> list:
+        """Get the status, latest metrics and parameters of every trial
+
+        Returns:
+            list: One dict per trial keyed by the Katib UI CSV header
+        """
+        text = self._get("fetch_hp_job_info", experimentName=self.experiment_name)
+        return list(csv.DictReader(io.StringIO(text)))
+
+    def fetch_duration(self, trial_name: str) -> Union[float, None]:
+        """Get the wall time of a finished trial in seconds"""
+        trial = self._get("fetch_trial", trialName=trial_name)
+        status = trial.get("status", {})
+        try:
+            start, end = (
+                datetime.strptime(status[key], "%Y-%m-%dT%H:%M:%SZ")
+                for key in ("startTime", "completionTime")
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+        return (end - start).total_seconds()
+
+    def stop(self, retries: int = 3) -> bool:
+        """Stop the experiment from creating new trials
+
+        Lowers spec.maxTrialCount to the number of trials the experiment owns,
+        read right before patching from status.trials and the experiment's
+        Trial objects. The patch carries the read resourceVersion, so if Katib
+        records a new trial in between the patch is rejected and retried with
+        the new count. Running trials
+        finish, after which Katib marks the experiment as succeeded, so the
+        trial results, the optimal trial and the waiting katib-launcher run
+        are all kept. Experiments that already completed are left alone.
+
+        Args:
+            retries (int, optional): Attempts when the experiment changes under the patch. Defaults to 3.
+
+        Returns:
+            bool: True if the experiment was patched, else False
+        """
+        k8s_config.load_kube_config()
+        api = k8s_client.CustomObjectsApi()
+        experiment_args = dict(
+            group="kubeflow.org",
+            version="v1beta1",
+            namespace=self.namespace,
+            plural="experiments",
+            name=self.experiment_name,
+        )
+
+        for _ in range(retries):
+            try:
+                experiment = api.get_namespaced_custom_object(**experiment_args)
+                status = experiment.get("status", {})
+                completed = [
+                    c["type"]
+                    for c in status.get("conditions", [])
+                    if c.get("status") == "True"
+                    and c["type"] in TERMINAL_EXPERIMENT_STATES
+                ]
+                if completed:
+                    logger.info(f"Experiment {self.experiment_name} already completed.")
+                    return False
+
+                # Count the Trial objects too, in case the controller created
+                # one but has not recorded it in the experiment status yet
+                trials = api.list_namespaced_custom_object(
+                    group="kubeflow.org",
+                    version="v1beta1",
+                    namespace=self.namespace,
+                    plural="trials",
+                    label_selector=f"katib.kubeflow.org/experiment={self.experiment_name}",
+                )
+                trial_count = max(status.get("trials", 0), len(trials["items"]))
+                resource_version = experiment["metadata"]["resourceVersion"]
+                logger.info(
+                    f"Stopping experiment {self.experiment_name} at {trial_count} trials..."
+                )
+                api.patch_namespaced_custom_object(
+                    **experiment_args,
+                    body={
+                        "metadata": {"resourceVersion": resource_version},
+                        "spec": {"maxTrialCount": trial_count},
+                    },
+                )
+                return True
+            except ApiException as e:
+                if e.status == 409:
+                    # The experiment changed since it was read, try again
+                    continue
+                logger.error(e)
+                return False
+
+        logger.error(f"Unable to stop experiment {self.experiment_name}.")
+        return False
+
+    def _fetch_duration_or_none(self, trial_name: str) -> Union[float, None]:
+        try:
+            return self.fetch_duration(trial_name)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Unable to fetch the duration of {trial_name}: {e}")
+            return None
+
+    def _is_better(self, metric: float) -> bool:
+        if self.best is None or self.best.metric is None:
+            return metric is not None
+        if metric is None:
+            return False
+        if self.objective_type == "maximize":
+            return metric > self.best.metric
+        return metric < self.best.metric
+
+    def _to_trial(self, row: dict, duration: Union[float, None]) -> Trial:
+        skip = {"trialName", "Status", self.objective_metric_name}
+        metric = row.get(self.objective_metric_name)
+        return Trial(
+            name=row["trialName"],
+            status=row["Status"],
+            metric=float(metric) if metric else None,
+            duration=duration,
+            params={k: v for k, v in row.items() if k not in skip},
+        )
+
+    def watch(
+        self,
+        target: Union[float, None] = None,
+        patience: Union[int, None] = None,
+        stop_experiment: bool = False,
+        timeout: Union[int, None] = 60,
+    ) -> Iterator[Trial]:
+        """Yield trials as they finish, tracking the best so far in ``self.best``
+
+        Args:
+            target (Union[float, None], optional): Stop once the objective reaches this value. Defaults to None.
+            patience (Union[int, None], optional): Stop after this many finished trials without improvement. Defaults to None.
+            stop_experiment (bool, optional): Lower the experiment's maxTrialCount (see stop) when a stop condition is hit. Defaults to False.
+            timeout (Union[int, None], optional): Stop watching after this many minutes, like the launcher's experiment_timeout_minutes. Defaults to 60.
+
+        Yields:
+            Trial: The name, status, objective metric, duration (s) and parameters of each finished trial
+        """
+        seen = set()
+        since_improvement = 0
+        deadline = time.monotonic() + timeout * 60 if timeout else None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.warning(f"Timed out after {timeout} minutes.")
+                    return
+
+                # Check the experiment state before listing trials so trials
+                # finishing in between are still picked up on the last poll
+                try:
+                    status = self.experiment_status()
+                    rows = self.fetch_trials()
+                except (requests.RequestException, ValueError) as e:
+                    # The launcher may not have created the experiment yet, or
+                    # an expired Dex session returned the login page
+                    logger.warning(e)
+                    time.sleep(self.poll_interval)
+                    continue
+                finished = [
+                    row
+                    for row in rows
+                    if row["Status"] in TERMINAL_TRIAL_STATES
+                    and row["trialName"] not in seen
+                ]
+                durations = pool.map(
+                    lambda row: self._fetch_duration_or_none(row["trialName"]), finished
+                )
+
+                for row, duration in zip(finished, durations):
+                    seen.add(row["trialName"])
+                    trial = self._to_trial(row, duration)
+                    if self._is_better(trial.metric):
+                        self.best = trial
+                        since_improvement = 0
+                    else:
+                        since_improvement += 1
+                    best_metric = self.best.metric if self.best else None
+                    logger.info(f"{trial} best={best_metric}")
+                    yield trial
+
+                    reached = target is not None and self._reached(target)
+                    stalled = patience is not None and since_improvement >= patience
+                    if reached or stalled:
+                        if reached:
+                            logger.info(f"Target {target} reached.")
+                        else:
+                            logger.info(f"No improvement in {patience} trials.")
+                        if stop_experiment and status not in TERMINAL_EXPERIMENT_STATES:
+                            self.stop()
+                        return
+
+                if status in TERMINAL_EXPERIMENT_STATES:
+                    return
+                time.sleep(self.poll_interval)
+
+    def _reached(self, target: float) -> bool:
+        if self.best is None or self.best.metric is None:
+            return False
+        if self.objective_type == "maximize":
+            return self.best.metric >= target
+        return self.best.metric <= target
@@ -0,0 +1,54 @@
+import numpy as np
+from typing import Union
+
+
+def stratified_sample_index(
+    y: np.ndarray,
+    sample_fraction: float = 1.0,
+    max_rows: Union[int, None] = None,
+    seed: int = 20,
+    min_per_class: int = 5,
+) -> np.ndarray:
+    """Get a reproducible stratified subsample of row indices
+
+    Each class keeps its share of the sample, but never fewer than
+    min_per_class rows (or all of its rows if it has fewer), so a trial's
+    own stratified 80/20 split still sees every class in its test set. The
+    floor can push the sample slightly above max_rows.
+
+    Args:
+        y (np.ndarray): The target used to stratify the sample
+        sample_fraction (float, optional): The fraction of rows to keep. Defaults to 1.0.
+        max_rows (Union[int, None], optional): The maximum number of rows to keep. Defaults to None.
+        seed (int, optional): The random seed. Defaults to 20.
+        min_per_class (int, optional): The minimum number of rows kept per class. Defaults to 5.
+
+    Returns:
+        np.ndarray: The sorted row indices of the sample
+
+    Raises:
+        ValueError: If sample_fraction is not in (0, 1] or max_rows is negative
+    """
+    if not 0 < sample_fraction <= 1:
+        raise ValueError(f"sample_fraction must be in (0, 1], got {sample_fraction}")
+    if max_rows is not None and max_rows < 0:
+        raise ValueError(f"max_rows must not be negative, got {max_rows}")
+
+    y = np.asarray(y)
+    n_rows = len(y)
+    n_sample = int(n_rows * sample_fraction)
+    if max_rows:
+        n_sample = min(n_sample, max_rows)
+
+    if n_sample >= n_rows:
+        return np.arange(n_rows)
+
+    rng = np.random.RandomState(seed)
+    sample_idx = []
+    for label in np.unique(y):
+        class_idx = np.flatnonzero(y == label)
+        n_class = round(n_sample * len(class_idx) / n_rows)
+        n_class = min(max(n_class, min_per_class), len(class_idx))
+        sample_idx.append(rng.choice(class_idx, n_class, replace=False))
+
+    return np.sort(np.concatenate(sample_idx))
@@ -13,7 +13,7 @@ logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
 
 
-def run(train_path, bucket, **kwargs):
+def run(train_path, bucket, full_data=False, seed=20, **kwargs):
 
     logger.info(train_path)
     logger.info(bucket)
@@ -28,11 +28,19 @@ def run(train_path, bucket, **kwargs):
 
     # Load the dataset
     logger.info("Load the dataset...")
-    X_data = np.load(train_path_local)["xtrain"]
-    y_data = np.load(train_path_local)["ytrain"]
+    data = np.load(train_path_local)
+    X_data = data["xtrain"]
+    y_data = data["ytrain"]
+
+    # Train on the stratified subsample precomputed by prep_data, if any
+    if "sample_idx" in data.files and not full_data:
+        sample_idx = data["sample_idx"]
+        logger.info(f"Using {len(sample_idx)} of {len(y_data)} rows...")
+        X_data = X_data[sample_idx]
+        y_data = y_data[sample_idx]
 
     X_train, X_test, y_train, y_test = train_test_split(
-        X_data, y_data, test_size=0.2, random_state=20
+        X_data, y_data, test_size=0.2, random_state=seed, stratify=y_data
     )
     logger.debug((X_train.shape, X_test.shape, y_train.shape, y_test.shape))
 
@@ -9,6 +9,9 @@ def prep_data(
     features: list = ["annual_inc", "revol_util"],
     seed: int = 20,
     cloud_type: str = "aws",
+    sample_fraction: float = 1.0,
+    max_rows: int = 0,
+    data_dir: str = "data",
 ) -> NamedTuple("Outputs", [("train_path", str), ("test_path", str)],):
 
     import logging
@@ -18,6 +21,7 @@ def prep_data(
     from sklearn.preprocessing import StandardScaler
     from collections import namedtuple
     from os import mkdir
+    from kf_utils.sampling import stratified_sample_index
 
     if cloud_type == "aws":
         from kf_utils.aws import upload_blob
@@ -78,10 +82,19 @@ def prep_data(
     train_path_local = "train.npz"
     test_path_local = "test.npz"
 
-    train_path = f"data/{train_path_local}"
-    test_path = f"data/{test_path_local}"
+    train_path = f"{data_dir}/{train_path_local}"
+    test_path = f"{data_dir}/{test_path_local}"
 
-    np.savez_compressed(file=train_path_local, xtrain=X_train, ytrain=y_train)
+    # Precompute a stratified subsample for fast HP tuning trials
+    train_data = {"xtrain": X_train, "ytrain": y_train}
+    if sample_fraction < 1 or max_rows:
+        sample_idx = stratified_sample_index(
+            y_train.values, sample_fraction, max_rows, seed
+        )
+        logger.info(f"Sampled {len(sample_idx)} of {len(y_train)} training rows...")
+        train_data["sample_idx"] = sample_idx
+
+    np.savez_compressed(file=train_path_local, **train_data)
     np.savez_compressed(file=test_path_local, xtest=X_test, ytest=y_test)
 
     upload_blob(bucket, train_path_local, train_path)
@@ -96,7 +109,7 @@ def train(
     train_path: str,
     model_dir: str,
     cloud_type: str = "aws",
-    params: dict = {"objective": "binary", "seed": 20},
+    params: dict = {"n_estimators": 100, "max_depth": 4},
 ) -> str:
 
     from sklearn.ensemble import RandomForestClassifier
@@ -124,12 +137,8 @@ def train(
     X_train = np.load(train_path_local)["xtrain"]
     y_train = np.load(train_path_local)["ytrain"]
 
-    # Set up the model params
-    logger.info("Begin training...")
-    params = {
-        "n_estimators": 100,
-        "max_depth": 4,
-    }
+    # Train on the full dataset with the given (e.g. HP tuned) params
+    logger.info(f"Begin training with {params}...")
     clf = RandomForestClassifier(**params)
     clf.fit(X_train, y_train)
 
@@ -145,6 +154,143 @@ def train(
     return model_path
 
 
+def compact(
+    bucket: str,
+    model_path: str,
+    test_path: str,
+    model_dir: str,
+    cloud_type: str = "aws",
+    auc_tolerance: float = 0.001,
+    latency_tolerance: float = 0.05,
+    latency_rows: int = 200,
+    repeats: int = 5,
+    candidates: int = 20,
+) -> NamedTuple(
+    "Outputs",
+    [("model_path", str), ("fetch_s", float), ("load_s", float), ("row_ms", float)],
+):
+
+    import copy
+    import logging
+    import os
+    import time
+    from collections import namedtuple
+    from datetime import datetime
+    import numpy as np
+    from sklearn.metrics import roc_auc_score
+    from joblib import dump, load
+
+    if cloud_type == "aws":
+        from kf_utils.aws import upload_blob, download_blob
+    elif cloud_type == "gcs":
+        from kf_utils.gcs import upload_blob, download_blob
+    else:
+        raise Exception("Invalid cloud option")
+
+    logging.basicConfig()
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+    output = namedtuple("Outputs", ["model_path", "fetch_s", "load_s", "row_ms"])
+
+    # Download the test data
+    local_data_path = "test.npz"
+    download_blob(bucket, test_path, local_data_path)
+    X_test = np.load(local_data_path)["xtest"]
+    y_test = np.load(local_data_path)["ytest"]
+
+    # Median wall time of a callable over several runs
+    def median_time(func):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return float(np.median(times))
+
+    # Measure what a predictor pod pays for a model artifact: pulling it from
+    # the bucket, loading it, and predicting single rows
+    def profile(blob_path, local_path):
+        fetch_s = median_time(lambda: download_blob(bucket, blob_path, local_path))
+        load_s = median_time(lambda: load(local_path))
+        clf = load(local_path)
+
+        rows = X_test[:latency_rows]
+
+        def predict_rows():
+            for row in rows:
+                clf.predict_proba(row.reshape(1, -1))
+
+        row_ms = 1000 * median_time(predict_rows) / max(len(rows), 1)
+        auc = roc_auc_score(y_test, clf.predict_proba(X_test)[:, 1])
+        return clf, {
+            "size_mb": os.path.getsize(local_path) / 1e6,
+            "fetch_s": fetch_s,
+            "load_s": load_s,
+            "row_ms": row_ms,
+            "auc": auc,
+            "nodes": sum(tree.tree_.node_count for tree in clf.estimators_),
+        }
+
+    logger.info("Profiling the original model...")
+    clf, before = profile(model_path, "model.joblib")
+    logger.info(f"Original model: {before}")
+
+    # Compact the fitted forest by keeping only its first k trees. The trees
+    # are independent bootstrap fits, so a prefix is itself a valid forest.
+    # Score every candidate prefix from one pass of per-tree predictions and
+    # keep the smallest whose AUC holds. Nothing is refit, so the remaining
+    # trees are exactly the ones the tuned model was trained with.
+    logger.info("Compacting the model...")
+    tree_probs = np.stack(
+        [tree.predict_proba(X_test)[:, 1] for tree in clf.estimators_]
+    )
+    prefix_probs = np.cumsum(tree_probs, axis=0)
+    n_trees = len(clf.estimators_)
+    n_keep = n_trees
+    for k in np.unique(np.linspace(1, n_trees, candidates).astype(int)):
+        prefix_auc = roc_auc_score(y_test, prefix_probs[k - 1] / k)
+        if prefix_auc >= before["auc"] - auc_tolerance:
+            n_keep = int(k)
+            break
+
+    if n_keep == n_trees:
+        logger.warning("No smaller forest holds the AUC, keeping the original.")
+        return output(model_path, before["fetch_s"], before["load_s"], before["row_ms"])
+
+    logger.info(f"Keeping {n_keep} of {n_trees} trees (n_estimators changes)...")
+    compact_clf = copy.copy(clf)
+    compact_clf.estimators_ = clf.estimators_[:n_keep]
+    compact_clf.n_estimators = n_keep
+    compact_model_path = "./rfclf-model-compact.joblib"
+    dump(compact_clf, compact_model_path)
+
+    # Stage the candidate outside the serving model directory until it passes
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    staging_path = f"staging/rfc-model-compact-{timestamp}.joblib"
+    upload_blob(bucket, compact_model_path, staging_path)
+
+    logger.info("Profiling the compacted model...")
+    _, after = profile(staging_path, compact_model_path)
+    logger.info(f"Compacted model: {after}")
+
+    # Only publish the compacted model if accuracy holds, pod start up
+    # (download plus load) is no slower and per-row latency is within tolerance
+    accuracy_holds = after["auc"] >= before["auc"] - auc_tolerance
+    faster_start = (
+        after["fetch_s"] + after["load_s"] <= before["fetch_s"] + before["load_s"]
+    )
+    faster_predict = after["row_ms"] <= before["row_ms"] * (1 + latency_tolerance)
+    if not (accuracy_holds and faster_start and faster_predict):
+        logger.warning("Compacted model did not improve, keeping the original.")
+        return output(model_path, before["fetch_s"], before["load_s"], before["row_ms"])
+
+    compact_path = f"{model_dir}/rfc-model-compact-{timestamp}.joblib"
+    upload_blob(bucket, compact_model_path, compact_path)
+
+    return output(compact_path, after["fetch_s"], after["load_s"], after["row_ms"])
+
+
 def eval(
     bucket: str,
     model_path: str,
@@ -209,17 +355,144 @@ def eval(
 
 
 def generate_serve_manifest(
-    model_name: str, storage_uri: str, inference_type: str = "lightgbm"
+    model_name: str,
+    storage_uri: str,
+    inference_type: str = "lightgbm",
+    profile: dict = None,
+    headroom: float = 0.7,
 ) -> dict:
+    """Generate a KServe InferenceService manifest
+
+    Args:
+        model_name (str): The name of the inference service
+        storage_uri (str): The URI of the model artifact
+        inference_type (str, optional): The KServe predictor type. Defaults to "lightgbm".
+        profile (dict, optional): The measured serving profile of the model used
+            to size the predictor. Supported keys are:
+            ``latency_ms`` (per-request latency at the measured throughput,
+            e.g. the ``row_ms`` output of ``compact``),
+            ``throughput_rps`` (requests per second a single replica sustains;
+            if omitted but ``latency_ms`` is given, a replica serving one
+            request at a time is assumed, i.e. 1000 / ``latency_ms``),
+            ``min_rps`` / ``peak_rps`` (expected traffic),
+            ``cpu`` / ``memory`` (container requests, e.g. "500m" / "1Gi"),
+            ``cpu_limit`` / ``memory_limit`` (defaults to the requests),
+            ``max_batch_size`` / ``max_batch_latency_ms`` (enable the request batcher).
+            Defaults to None, which returns the bare manifest.
+        headroom (float, optional): The fraction of a replica's measured
+            throughput to plan for, leaving room for traffic bursts. Defaults to 0.7.
+
+    Replicas are sized so each handles ``headroom * throughput_rps``, and
+    ``containerConcurrency`` follows Little's law at that planned rate:
+    ``ceil(headroom * throughput_rps * latency_ms / 1000)``, raised to
+    ``max_batch_size`` when the batcher is enabled.
+
+    Returns:
+        dict: The InferenceService manifest
+
+    Raises:
+        ValueError: If headroom, throughput_rps or latency_ms is not positive
+    """
+    from math import ceil
+
+    predictor = {inference_type: {"storageUri": storage_uri}}
+    profile = profile or {}
+
+    if headroom <= 0:
+        raise ValueError(f"headroom must be positive, got {headroom}")
+
+    latency_ms = profile.get("latency_ms")
+    if latency_ms is not None and latency_ms <= 0:
+        raise ValueError(f"latency_ms must be positive, got {latency_ms}")
+
+    # Size the replicas from the measured per-replica throughput, falling back
+    # to a serial predictor's throughput when only the latency was measured
+    throughput = profile.get("throughput_rps")
+    if throughput is None and latency_ms is not None:
+        throughput = 1000 / latency_ms
+    if throughput is not None:
+        if throughput <= 0:
+            raise ValueError(f"throughput_rps must be positive, got {throughput}")
+        replica_rps = throughput * headroom
+        predictor["minReplicas"] = max(
+            1, ceil(profile.get("min_rps", 0) / replica_rps)
+        )
+        predictor["maxReplicas"] = max(
+            predictor["minReplicas"],
+            ceil(profile.get("peak_rps", throughput) / replica_rps),
+        )
+
+        # Little's law: in-flight requests = arrival rate * latency
+        if latency_ms is not None:
+            predictor["containerConcurrency"] = max(
+                1, ceil(replica_rps * latency_ms / 1000)
+            )
+
+    # Container resources
+    resource_requests = {
+        key: profile[key] for key in ("cpu", "memory") if profile.get(key)
+    }
+    if resource_requests:
+        limits = {
+            key: profile.get(f"{key}_limit", value)
+            for key, value in resource_requests.items()
+        }
+        predictor[inference_type]["resources"] = {
+            "requests": resource_requests,
+            "limits": limits,
+        }
+
+    # Request batcher. A replica must accept at least a full batch of
+    # concurrent requests, otherwise batches never fill and every request
+    # waits out maxLatency.
+    if profile.get("max_batch_size"):
+        max_batch_size = int(profile["max_batch_size"])
+        predictor["batcher"] = {
+            "maxBatchSize": max_batch_size,
+            "maxLatency": int(profile.get("max_batch_latency_ms", 100)),
+        }
+        predictor["containerConcurrency"] = max(
+            predictor.get("containerConcurrency", 0), max_batch_size
+        )
+
     manifest = {
         "apiVersion": "serving.kserve.io/v1beta1",
         "kind": "InferenceService",
         "metadata": {"name": model_name},
-        "spec": {"predictor": {inference_type: {"storageUri": storage_uri}}},
+        "spec": {"predictor": predictor},
     }
 
     return manifest
 
 
+def generate_serve_manifests(
+    models: list,
+    inference_type: str = "lightgbm",
+    headroom: float = 0.7,
+) -> list:
+    """Generate KServe InferenceService manifests for many models
+
+    Args:
+        models (list): One dict per model with ``model_name`` and ``storage_uri``
+            and, optionally, ``inference_type`` and ``profile`` (see
+            ``generate_serve_manifest``)
+        inference_type (str, optional): The default KServe predictor type. Defaults to "lightgbm".
+        headroom (float, optional): The fraction of measured throughput to plan for. Defaults to 0.7.
+
+    Returns:
+        list: The InferenceService manifests, in the same order as ``models``
+    """
+    return [
+        generate_serve_manifest(
+            model["model_name"],
+            model["storage_uri"],
+            inference_type=model.get("inference_type", inference_type),
+            profile=model.get("profile"),
+            headroom=headroom,
+        )
+        for model in models
+    ]
+
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -2,7 +2,7 @@ import kfp.dsl as dsl
 from kfp.dsl import get_pipeline_conf
 from kfp.compiler import Compiler
 from kfp.components import create_component_from_func
-from components.tasks import prep_data, train, eval
+from components.tasks import prep_data, train, compact, eval
 from kf_utils.client import get_client
 import datetime
 
@@ -22,6 +22,12 @@ train_func = create_component_from_func(
     base_image=BASE_IMAGE,
 )
 
+compact_func = create_component_from_func(
+    compact,
+    output_component_file="components/compact.yaml",
+    base_image=BASE_IMAGE,
+)
+
 eval_func = create_component_from_func(
     eval,
     output_component_file="components/eval.yaml",
@@ -37,6 +43,10 @@ def train_pipeline(
     raw_data: str,
     bucket: str,
     model_dir: str,
+    params: dict = {"n_estimators": 100, "max_depth": 4},
+    sample_fraction: float = 1.0,
+    max_rows: int = 0,
+    data_dir: str = "data",
 ):
 
     # Set to always retrieve the image from the registry
@@ -46,6 +56,9 @@ def train_pipeline(
     prep_data_op = prep_data_func(
         raw_data,
         bucket,
+        sample_fraction=sample_fraction,
+        max_rows=max_rows,
+        data_dir=data_dir,
     )
     prep_data_op.execution_options.caching_strategy.max_cache_staleness = "P0D"
 
@@ -54,31 +67,42 @@ def train_pipeline(
         bucket,
         prep_data_op.outputs["train_path"],
         model_dir,
+        params=params,
     )
     train_lgbm_op.execution_options.caching_strategy.max_cache_staleness = "P0D"
 
+    # Compact the trained model for faster loading and serving
+    compact_op = compact_func(
+        bucket,
+        model_path=train_lgbm_op.output,
+        test_path=prep_data_op.outputs["test_path"],
+        model_dir=model_dir,
+    )
+    compact_op.execution_options.caching_strategy.max_cache_staleness = "P0D"
+
     # Evaluate the prepared data
     eval_lgbm_op = eval_func(
         bucket,
-        model_path=train_lgbm_op.output,
+        model_path=compact_op.outputs["model_path"],
         test_path=prep_data_op.outputs["test_path"],
     )
     eval_lgbm_op.execution_options.caching_strategy.max_cache_staleness = "P0D"
 
 
-arguments = {
-    "raw_data": "gs://amazing-public-data/lending_club/lending_club_data.tsv",
-    "bucket": "kubeflow-demo-v14",
-    "model_dir": "model",
-}
+if __name__ == "__main__":
+    arguments = {
+        "raw_data": "gs://amazing-public-data/lending_club/lending_club_data.tsv",
+        "bucket": "kubeflow-demo-v14",
+        "model_dir": "model",
+    }
 
-client = get_client(ENDPOINT, NAMESPACE, "user@example.com")
-Compiler().compile(train_pipeline, "pipeline.yaml")
-response = client.create_run_from_pipeline_package(
-    "pipeline.yaml",
-    run_name=f"rfc-run-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}",
-    arguments=arguments,
-    experiment_name="rfc-test",
-    namespace="kubeflow-user-example-com",
-)
-print(response)
+    client = get_client(ENDPOINT, NAMESPACE, "user@example.com")
+    Compiler().compile(train_pipeline, "pipeline.yaml")
+    response = client.create_run_from_pipeline_package(
+        "pipeline.yaml",
+        run_name=f"rfc-run-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}",
+        arguments=arguments,
+        experiment_name="rfc-test",
+        namespace="kubeflow-user-example-com",
+    )
+    print(response)
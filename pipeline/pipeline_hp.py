@@ -4,7 +4,9 @@ from kfp.dsl import get_pipeline_conf
 from kfp.compiler import Compiler
 from kfp.components import create_component_from_func
 from components.tasks import prep_data, train, eval
-from kf_utils.client import get_client
+from pipeline import train_pipeline
+from kf_utils.client import get_client, get_session
+from kf_utils.katib import ExperimentMonitor
 import datetime
 import logging
 from kubeflow.katib import (
@@ -24,7 +26,17 @@ NAMESPACE = "kubeflow-user-example-com"
 ENDPOINT = "http://127.0.0.1:8080"
 BASE_IMAGE = "195565468328.dkr.ecr.us-east-1.amazonaws.com/kubeflow-demo-v14:v1"
 BUCKET = "kubeflow-demo-v14"
-TRAIN_PATH = "data/train.npz"
+RAW_DATA = "gs://amazing-public-data/lending_club/lending_club_data.tsv"
+MODEL_DIR = "model"
+
+# Trials train on a stratified subsample precomputed by prep_data; the winner
+# is refit on all rows. The sweep and the refit use separate data dirs so the
+# refit never overwrites the data trials are reading.
+SAMPLE_FRACTION = 0.1
+MAX_ROWS = 100000
+DATA_DIR = "data/hp"
+REFIT_DATA_DIR = "data/refit"
+TRAIN_PATH = f"{DATA_DIR}/train.npz"
 
 # HP Tuning Spec
 # Experiment name and namespace.
@@ -121,6 +133,12 @@ experiment_spec = V1beta1ExperimentSpec(
     trial_template=trial_template,
 )
 
+prep_data_func = create_component_from_func(
+    prep_data,
+    output_component_file="components/prep_data.yaml",
+    base_image=BASE_IMAGE,
+)
+
 # Get the Katib launcher.
 katib_experiment_launcher_op = kfp.components.load_component_from_url(
     "https://raw.githubusercontent.com/kubeflow/pipelines/master/components/kubeflow/katib-launcher/component.yaml"
@@ -140,16 +158,27 @@ def trial_run():
     # Set to always retrieve the image from the registry
     get_pipeline_conf().set_image_pull_policy("Always")
 
+    # Prepare the data and the trials' stratified subsample
+    prep_data_op = prep_data_func(
+        RAW_DATA,
+        BUCKET,
+        sample_fraction=SAMPLE_FRACTION,
+        max_rows=MAX_ROWS,
+        data_dir=DATA_DIR,
+    )
+    prep_data_op.execution_options.caching_strategy.max_cache_staleness = "P0D"
+
     op = katib_experiment_launcher_op(
         experiment_name=experiment_name,
         experiment_namespace=experiment_namespace,
         experiment_spec=ApiClient().sanitize_for_serialization(experiment_spec),
         experiment_timeout_minutes=60,
         delete_finished_experiment=False,
-    )
+    ).after(prep_data_op)
 
 
-client = get_client(ENDPOINT, NAMESPACE, "user@example.com")
+session = get_session(ENDPOINT, "user@example.com")
+client = get_client(ENDPOINT, NAMESPACE, session=session)
 Compiler().compile(trial_run, "pipeline_hp.tar.gz")
 response = client.create_run_from_pipeline_package(
     "pipeline_hp.tar.gz",
@@ -159,3 +188,39 @@ response = client.create_run_from_pipeline_package(
     namespace="kubeflow-user-example-com",
 )
 print(response)
+
+# Stream trial results as they finish and stop the experiment early once the
+# target AUC is hit or the best AUC has not improved in a few trials. Stopping
+# lowers maxTrialCount, so running trials finish and the experiment succeeds.
+monitor = ExperimentMonitor(
+    session,
+    ENDPOINT,
+    experiment_name,
+    experiment_namespace,
+    objective_metric_name=objective.objective_metric_name,
+    objective_type=objective.type,
+)
+for trial in monitor.watch(
+    target=0.75, patience=4, stop_experiment=True, timeout=60
+):
+    print(f"{trial.name}: auc={trial.metric} duration={trial.duration}s")
+print(f"Best trial: {monitor.best}")
+
+# Refit the best configuration on the full training data
+if monitor.best is not None:
+    best_params = {p.name: int(float(monitor.best.params[p.name])) for p in parameters}
+    Compiler().compile(train_pipeline, "pipeline.yaml")
+    response = client.create_run_from_pipeline_package(
+        "pipeline.yaml",
+        run_name=f"rfc-refit-run-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}",
+        arguments={
+            "raw_data": RAW_DATA,
+            "bucket": BUCKET,
+            "model_dir": MODEL_DIR,
+            "params": best_params,
+            "data_dir": REFIT_DATA_DIR,
+        },
+        experiment_name="rfc-test",
+        namespace="kubeflow-user-example-com",
+    )
+    print(response)